@@ -23,7 +23,7 @@ impl ExecutionProvider for Execution {
             LanguageKind::Javascript => {
                 #[cfg(feature = "javascript")]
                 {
-                    let session = crate::javascript::JavaScriptSession::new(lang, modules);
+                    let session = crate::javascript::JavaScriptSession::one_shot(lang, modules);
                     session.run(snippet, options).await
                 }
                 #[cfg(not(feature = "javascript"))]
@@ -149,7 +149,7 @@ impl ExecutionSession for Session {
         for entry in std::fs::read_dir(path).map_err(io_error)? {
             let entry = entry.map_err(io_error)?;
             if entry.metadata().map_err(io_error)?.is_file() {
-                result.push(entry.file_name().to_string_lossy().to_string());
+                result.push(entry.file_name().to_string_lossy().into_owned());
             }
         }
         Ok(result)
@@ -9,44 +9,45 @@ pub mod native_module {
 
     #[rquickjs::function]
     pub fn println(line: String, ctx: Ctx<'_>) {
-        super::write_to_stdout(ctx, line);
+        super::write_to_stdout(ctx, "", &line);
     }
 
     #[rquickjs::function]
     pub fn eprintln(line: String, ctx: Ctx<'_>) {
-        super::write_to_stderr(ctx, line);
+        super::write_to_stderr(ctx, &line);
     }
 
     #[rquickjs::function]
     pub fn trace(line: String, ctx: Ctx<'_>) {
-        super::write_to_stdout(ctx, format!("[TRACE] {line}"));
+        super::write_to_stdout(ctx, "[TRACE] ", &line);
     }
 
     #[rquickjs::function]
     pub fn debug(line: String, ctx: Ctx<'_>) {
-        super::write_to_stdout(ctx, format!("[DEBUG] {line}"));
+        super::write_to_stdout(ctx, "[DEBUG] ", &line);
     }
 
     #[rquickjs::function]
     pub fn info(line: String, ctx: Ctx<'_>) {
-        super::write_to_stdout(ctx, format!("[INFO] {line}"));
+        super::write_to_stdout(ctx, "[INFO] ", &line);
     }
 
     #[rquickjs::function]
     pub fn warn(line: String, ctx: Ctx<'_>) {
-        super::write_to_stdout(ctx, format!("[WARN] {line}"));
+        super::write_to_stdout(ctx, "[WARN] ", &line);
     }
 
     #[rquickjs::function]
     pub fn error(line: String, ctx: Ctx<'_>) {
-        super::write_to_stdout(ctx, format!("[ERROR] {line}"));
+        super::write_to_stdout(ctx, "[ERROR] ", &line);
     }
 }
 
+// Captured lines, each followed by a newline
 #[derive(Default, JsLifetime)]
 struct CapturedOutput {
-    pub stdout: RefCell<Vec<String>>,
-    pub stderr: RefCell<Vec<String>>,
+    pub stdout: RefCell<String>,
+    pub stderr: RefCell<String>,
 }
 
 pub fn init_capturing(ctx: Ctx<'_>) -> Result<(), Error> {
@@ -56,11 +57,11 @@ pub fn init_capturing(ctx: Ctx<'_>) -> Result<(), Error> {
     Ok(())
 }
 
-pub fn get_captured_output(ctx: Ctx<'_>) -> Result<(Vec<String>, Vec<String>), Error> {
+pub fn get_captured_output(ctx: Ctx<'_>) -> Result<(String, String), Error> {
     if let Some(captured_output) = ctx.userdata::<CapturedOutput>() {
         Ok((
-            captured_output.stdout.borrow().clone(),
-            captured_output.stderr.borrow().clone(),
+            take_lines(&captured_output.stdout),
+            take_lines(&captured_output.stderr),
         ))
     } else {
         Err(Error::Internal(
@@ -69,21 +70,42 @@ pub fn get_captured_output(ctx: Ctx<'_>) -> Result<(Vec<String>, Vec<String>), E
     }
 }
 
-fn write_to_stdout(ctx: Ctx<'_>, line: String) {
+// Takes the captured lines joined by newlines, without the last line's newline
+fn take_lines(output: &RefCell<String>) -> String {
+    let mut lines = output.take();
+    if lines.ends_with('\n') {
+        lines.pop();
+    }
+    lines
+}
+
+#[inline]
+fn write_to_stdout(ctx: Ctx<'_>, prefix: &str, line: &str) {
     let captured_output = ctx.userdata::<CapturedOutput>().unwrap();
-    captured_output.stdout.borrow_mut().push(line);
+    let mut stdout = captured_output.stdout.borrow_mut();
+    stdout.push_str(prefix);
+    stdout.push_str(line);
+    stdout.push('\n');
 }
 
-fn write_to_stderr(ctx: Ctx<'_>, line: String) {
+#[inline]
+fn write_to_stderr(ctx: Ctx<'_>, line: &str) {
     let captured_output = ctx.userdata::<CapturedOutput>().unwrap();
-    captured_output.stderr.borrow_mut().push(line);
+    let mut stderr = captured_output.stderr.borrow_mut();
+    stderr.push_str(line);
+    stderr.push('\n');
 }
 
 // JS functions for the console implementation
 pub const CONSOLE_JS: &str = include_str!("console.js");
 
-// JS code wiring the console module into the global context
+// JS code loading the module into the context once
 pub const WIRE_JS: &str = r#"
+        import '__golem_exec_js_builtin/console';
+    "#;
+
+// JS code (re)assigning the console global before every run
+pub const UPDATE_JS: &str = r#"
         import * as __golem_exec_js_console from '__golem_exec_js_builtin/console';
         globalThis.console = __golem_exec_js_console;
     "#;
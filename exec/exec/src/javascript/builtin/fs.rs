@@ -135,13 +135,10 @@ struct FsConfig {
     pub data_root: PathBuf,
 }
 
-fn get_data_root(ctx: &Ctx<'_>) -> PathBuf {
-    let fs_config = ctx.userdata::<FsConfig>().unwrap();
-    fs_config.data_root.clone()
-}
-
+#[inline]
 fn resolve_path(ctx: &Ctx<'_>, path: &str) -> PathBuf {
-    let data_root = get_data_root(ctx);
+    let fs_config = ctx.userdata::<FsConfig>().unwrap();
+    let data_root = &fs_config.data_root;
     let resolved_path = if let Some(stripped) = path.strip_prefix('/') {
         data_root.join(stripped)
     } else {
@@ -153,7 +150,7 @@ fn resolve_path(ctx: &Ctx<'_>, path: &str) -> PathBuf {
         data_root.join(cwd).join(path)
     };
 
-    if !resolved_path.starts_with(&data_root) {
+    if !resolved_path.starts_with(data_root) {
         panic!("Path {resolved_path:?} is outside the data root {data_root:?}",);
     }
 
@@ -1,4 +1,5 @@
 use std::fmt::Write;
+use std::sync::OnceLock;
 
 mod base64_js;
 mod buffer;
@@ -59,10 +60,26 @@ pub fn module_loader() -> (
     )
 }
 
-pub fn wire_builtins() -> String {
-    let mut result = String::new();
-    writeln!(result, "{}", console::WIRE_JS).unwrap();
-    writeln!(result, "{}", timeout::WIRE_JS).unwrap();
-    writeln!(result, "{}", process::WIRE_JS).unwrap();
-    result
+/// JS code loading the builtin modules into the context, evaluated once per context
+pub fn wire_builtins() -> &'static str {
+    static WIRING: OnceLock<String> = OnceLock::new();
+    WIRING.get_or_init(|| {
+        let mut result = String::new();
+        writeln!(result, "{}", console::WIRE_JS).unwrap();
+        writeln!(result, "{}", timeout::WIRE_JS).unwrap();
+        writeln!(result, "{}", process::WIRE_JS).unwrap();
+        result
+    })
+}
+
+/// JS code prepended to every snippet to refresh per-run builtin state and the builtin globals
+pub fn refresh_builtins() -> &'static str {
+    static REFRESH: OnceLock<String> = OnceLock::new();
+    REFRESH.get_or_init(|| {
+        let mut result = String::new();
+        writeln!(result, "{}", console::UPDATE_JS).unwrap();
+        writeln!(result, "{}", timeout::UPDATE_JS).unwrap();
+        writeln!(result, "{}", process::UPDATE_JS).unwrap();
+        result
+    })
 }
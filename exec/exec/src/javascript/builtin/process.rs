@@ -1,9 +1,14 @@
 pub const PROCESS_JS: &str = include_str!("process.js");
 
 pub const WIRE_JS: &str = r#"
-    import * as process from 'node:process';
-    import * as __golem_exec_js_readline from 'node:readline';
+    import 'node:process';
+    import 'node:readline';
+"#;
+
+// JS code refreshing the process module from the current run's globals and (re)assigning it
+pub const UPDATE_JS: &str = r#"
+    import * as __golem_exec_js_process from 'node:process';
 
-    process.__update();
-    globalThis.process = process;
+    __golem_exec_js_process.__update();
+    globalThis.process = __golem_exec_js_process;
 "#;
@@ -1,11 +1,9 @@
 use crate::model::Error;
 use futures::future::AbortHandle;
 use rquickjs::function::Args;
-use rquickjs::{CatchResultExt, Ctx, JsLifetime, Persistent, Value};
+use rquickjs::{CatchResultExt, CaughtError, Ctx, JsLifetime, Persistent, Value};
 use std::cell::RefCell;
-use std::collections::HashMap;
 use std::rc::Rc;
-use std::sync::atomic::AtomicUsize;
 
 // Native functions for the timeout implementation (based on wasm-rquickjs)
 #[rquickjs::module]
@@ -13,7 +11,6 @@ pub mod native_module {
     use crate::javascript::builtin::timeout::get_abort_state;
     use futures::future::abortable;
     use rquickjs::{Ctx, Persistent, Value};
-    use std::sync::atomic::Ordering;
 
     #[rquickjs::function]
     pub fn schedule(
@@ -34,11 +31,14 @@ pub mod native_module {
         ));
 
         let state = get_abort_state(ctx.clone()).unwrap();
-        let key = state.last_abort_id.fetch_add(1, Ordering::Relaxed);
+        let key = {
+            let mut abort_handles = state.abort_handles.borrow_mut();
+            abort_handles.push(Some(abort_handle));
+            abort_handles.len() - 1
+        };
         ctx.spawn(async move {
             let _ = task.await;
         });
-        state.abort_handles.borrow_mut().insert(key, abort_handle);
         key
     }
 
@@ -47,16 +47,17 @@ pub mod native_module {
         let state = get_abort_state(ctx).unwrap();
         let mut abort_handles = state.abort_handles.borrow_mut();
         let handle = abort_handles
-            .remove(&timeout_id)
+            .get_mut(timeout_id)
+            .and_then(Option::take)
             .expect("No such timeout ID");
         handle.abort();
     }
 }
 
+// Abort handles of the scheduled tasks, indexed by their timeout ID; cleared slots are `None`
 #[derive(Default, JsLifetime)]
 pub struct AbortState {
-    pub abort_handles: RefCell<HashMap<usize, AbortHandle>>,
-    pub last_abort_id: AtomicUsize,
+    pub abort_handles: RefCell<Vec<Option<AbortHandle>>>,
 }
 
 pub fn init_abort(ctx: Ctx<'_>) -> Result<Rc<AbortState>, Error> {
@@ -77,8 +78,13 @@ pub fn get_abort_state(ctx: Ctx<'_>) -> Result<Rc<AbortState>, Error> {
 // JS functions for the console implementation
 pub const TIMEOUT_JS: &str = include_str!("timeout.js");
 
-// JS code wiring the console module into the global context
+// JS code loading the module into the context once
 pub const WIRE_JS: &str = r#"
+        import '__golem_exec_js_builtin/timeout';
+    "#;
+
+// JS code (re)assigning the timer globals before every run
+pub const UPDATE_JS: &str = r#"
         import * as __golem_exec_js_timeout from '__golem_exec_js_builtin/timeout';
         globalThis.setTimeout = __golem_exec_js_timeout.setTimeout;
         globalThis.setImmediate = __golem_exec_js_timeout.setImmediate;
@@ -95,26 +101,41 @@ async fn scheduled_task(
     args: Persistent<Vec<Value<'static>>>,
 ) {
     if delay == 0 {
-        run_scheduled_task(ctx.clone(), code_or_fn.clone(), args.clone())
-            .catch(&ctx)
-            .expect("Failed to run scheduled task");
+        run_scheduled_task_until_interrupted(ctx, code_or_fn, args);
     } else {
         let duration = wstd::time::Duration::from_millis(delay as u64);
 
         loop {
             wstd::task::sleep(duration).await;
 
-            run_scheduled_task(ctx.clone(), code_or_fn.clone(), args.clone())
-                .catch(&ctx)
-                .expect("Failed to run scheduled task");
+            let completed =
+                run_scheduled_task_until_interrupted(ctx.clone(), code_or_fn.clone(), args.clone());
 
-            if !periodic {
+            if !periodic || !completed {
                 break;
             }
         }
     }
 }
 
+// Returns false if the task was stopped by the interrupt handler at the run's deadline, which
+// QuickJS signals with an uncatchable "interrupted" error
+fn run_scheduled_task_until_interrupted(
+    ctx: Ctx,
+    code_or_fn: Persistent<Value<'static>>,
+    args: Persistent<Vec<Value<'static>>>,
+) -> bool {
+    match run_scheduled_task(ctx.clone(), code_or_fn, args).catch(&ctx) {
+        Ok(()) => true,
+        Err(CaughtError::Exception(exception))
+            if exception.message().as_deref() == Some("interrupted") =>
+        {
+            false
+        }
+        Err(err) => panic!("Failed to run scheduled task: {err:?}"),
+    }
+}
+
 fn run_scheduled_task(
     ctx: Ctx,
     code_or_fn: Persistent<Value<'static>>,
@@ -7,11 +7,16 @@ use crate::model::{LanguageKind, StageResult};
 use crate::{get_contents_as_string, stage_result_failure};
 use futures::TryFutureExt;
 use rquickjs::loader::{BuiltinLoader, BuiltinResolver};
+use rquickjs::module::{Declared, WriteOptions};
 use rquickjs::{async_with, AsyncContext, AsyncRuntime, CatchResultExt, Ctx, Module, Object};
+use rustc_hash::FxHashMap;
 use std::cell::RefCell;
+use std::hash::{DefaultHasher, Hash, Hasher};
 use std::io::ErrorKind;
 use std::path::{Path, PathBuf};
+use std::rc::Rc;
 use std::sync::atomic::{AtomicU32, Ordering};
+use wasi::clocks::monotonic_clock;
 use wstd::future::FutureExt;
 use wstd::time::{Duration, Instant};
 
@@ -21,6 +26,60 @@ fn js_engine_error(err: rquickjs::Error) -> Error {
 
 static TEMP_DIR_COUNTER: AtomicU32 = AtomicU32::new(0);
 
+const MAIN_MODULE: &str = "main";
+
+// Kept well below the component's native stack, so that runaway recursion raises a RangeError
+// in QuickJS instead of trapping the whole instance
+const MAX_STACK_SIZE: usize = 256 * 1024;
+
+// Snippets longer than this are compiled on every run instead of being cached
+const MAX_CACHED_SOURCE_LEN: usize = 64 * 1024;
+
+// Limits of the bytecode cache, which is emptied when either of them would be exceeded
+const BYTECODE_CACHE_CAPACITY: usize = 256;
+const BYTECODE_CACHE_MAX_BYTES: usize = 4 * 1024 * 1024;
+
+thread_local! {
+    // Runtime of the last finished one-shot run
+    static IDLE_RUNTIME: RefCell<Option<AsyncRuntime>> = const { RefCell::new(None) };
+
+    static BYTECODE_CACHE: RefCell<BytecodeCache> = RefCell::new(BytecodeCache::default());
+}
+
+// Compiled bytecode of recently run snippets, keyed by the hash of their source. Snippets seen
+// only once are recorded without bytecode, so that unique snippets are not serialized in vain.
+#[derive(Default)]
+struct BytecodeCache {
+    entries: FxHashMap<u64, Option<Rc<[u8]>>>,
+    total_bytes: usize,
+}
+
+impl BytecodeCache {
+    fn get(&self, key: u64) -> Option<Option<Rc<[u8]>>> {
+        self.entries.get(&key).cloned()
+    }
+
+    fn insert(&mut self, key: u64, bytecode: Option<Rc<[u8]>>) {
+        let size = bytecode.as_ref().map_or(0, |bytecode| bytecode.len());
+        if self.entries.len() >= BYTECODE_CACHE_CAPACITY
+            || self.total_bytes + size > BYTECODE_CACHE_MAX_BYTES
+        {
+            self.entries.clear();
+            self.total_bytes = 0;
+        }
+        self.total_bytes += size;
+        if let Some(Some(previous)) = self.entries.insert(key, bytecode) {
+            self.total_bytes -= previous.len();
+        }
+    }
+}
+
+fn source_hash(source: &str) -> u64 {
+    let mut hasher = DefaultHasher::new();
+    source.hash(&mut hasher);
+    hasher.finish()
+}
+
 pub struct JavascriptComponent;
 
 impl JavascriptComponent {
@@ -30,7 +89,7 @@ impl JavascriptComponent {
         snippet: String,
         options: RunOptions,
     ) -> Result<ExecResult, Error> {
-        let session = JavaScriptSession::new(lang, files);
+        let session = JavaScriptSession::one_shot(lang, files);
         session.run(snippet, options).await
     }
 }
@@ -43,6 +102,12 @@ fn ensure_language_is_supported(lang: &Language) -> Result<(), Error> {
     }
 }
 
+async fn create_runtime() -> Result<AsyncRuntime, Error> {
+    let rt = AsyncRuntime::new().map_err(js_engine_error)?;
+    rt.set_max_stack_size(MAX_STACK_SIZE).await;
+    Ok(rt)
+}
+
 fn set_globals(
     ctx: Ctx<'_>,
     stdin: Option<String>,
@@ -51,41 +116,102 @@ fn set_globals(
     cwd: String,
     file_size_limit: Option<u64>,
 ) -> Result<(), rquickjs::Error> {
-    ctx.globals()
-        .set("__golem_exec_js_stdin", stdin.unwrap_or_default())?;
-    ctx.globals().set("__golem_exec_js_args", args)?;
+    let globals = ctx.globals();
+    globals.set("__golem_exec_js_stdin", stdin.unwrap_or_default())?;
+    globals.set("__golem_exec_js_args", args)?;
 
-    let env_obj = Object::new(ctx.clone())?;
+    let env_obj = Object::new(ctx)?;
     for (key, value) in env {
         env_obj.set(key, value)?;
     }
 
-    ctx.globals().set("__golem_exec_js_env", env_obj)?;
-    ctx.globals().set("__golem_exec_js_cwd", cwd)?;
-    ctx.globals()
-        .set("__golem_exec_js_file_size_limit", file_size_limit)?;
+    globals.set("__golem_exec_js_env", env_obj)?;
+    globals.set("__golem_exec_js_cwd", cwd)?;
+    globals.set("__golem_exec_js_file_size_limit", file_size_limit)?;
 
     Ok(())
 }
 
-fn run_snippet(
-    ctx: Ctx<'_>,
-    main_name: String,
-    main_content: String,
-    data_root: &Path,
-) -> Result<(), Error> {
+fn init_builtins(ctx: Ctx<'_>) -> Result<(), Error> {
+    let module = Module::evaluate(
+        ctx.clone(),
+        "__golem_exec_js_wiring",
+        builtin::wire_builtins(),
+    )
+    .catch(&ctx)
+    .map_err(|err| Error::Internal(err.to_string()))?;
+    module
+        .finish::<()>()
+        .catch(&ctx)
+        .map_err(|err| Error::Internal(err.to_string()))?;
+    Ok(())
+}
+
+fn declare_main_module<'js>(
+    ctx: Ctx<'js>,
+    source: String,
+) -> rquickjs::Result<Module<'js, Declared>> {
+    if source.len() > MAX_CACHED_SOURCE_LEN {
+        return Module::declare(ctx, MAIN_MODULE, source);
+    }
+
+    let key = source_hash(&source);
+    match BYTECODE_CACHE.with(|cache| cache.borrow().get(key)) {
+        Some(Some(bytecode)) => {
+            // SAFETY: the bytecode was produced by `Module::write` of the same engine
+            unsafe { Module::load(ctx, &bytecode) }
+        }
+        Some(None) => {
+            let module = Module::declare(ctx, MAIN_MODULE, source)?;
+            let bytecode: Rc<[u8]> = module.write(WriteOptions::default())?.into();
+            BYTECODE_CACHE.with(|cache| cache.borrow_mut().insert(key, Some(bytecode)));
+            Ok(module)
+        }
+        None => {
+            BYTECODE_CACHE.with(|cache| cache.borrow_mut().insert(key, None));
+            Module::declare(ctx, MAIN_MODULE, source)
+        }
+    }
+}
+
+fn run_snippet(ctx: Ctx<'_>, main_content: String, data_root: &Path) -> Result<(), Error> {
     builtin::fs::init_fs(ctx.clone(), data_root)?;
     builtin::console::init_capturing(ctx.clone())?;
-    let module = Module::evaluate(ctx.clone(), main_name, main_content)
+    let (_, promise) = declare_main_module(ctx.clone(), main_content)
+        .and_then(|module| module.eval())
         .catch(&ctx)
         .map_err(|err| Error::RuntimeFailed(stage_result_failure(err.to_string())))?;
-    module
+    promise
         .finish::<()>()
         .catch(&ctx)
         .map_err(|err| Error::RuntimeFailed(stage_result_failure(err.to_string())))?;
     Ok(())
 }
 
+// Point on the monotonic clock (in nanoseconds) after which a run is interrupted
+#[derive(Clone, Copy)]
+struct Deadline {
+    deadline_ns: u64,
+}
+
+impl Deadline {
+    fn after(time_ms: Option<u64>) -> Self {
+        let deadline_ns = match time_ms {
+            Some(time_ms) => {
+                monotonic_clock::now().saturating_add(time_ms.saturating_mul(1_000_000))
+            }
+            None => u64::MAX,
+        };
+        Self { deadline_ns }
+    }
+
+    // Polled by the QuickJS interrupt handler while the snippet is running
+    #[inline(always)]
+    fn has_passed(self, now_ns: u64) -> bool {
+        now_ns >= self.deadline_ns
+    }
+}
+
 struct JavaScriptSessionState {
     rt: AsyncRuntime,
     ctx: AsyncContext,
@@ -97,6 +223,7 @@ pub struct JavaScriptSession {
     modules: Vec<File>,
     data_root: PathBuf,
     state: RefCell<Option<JavaScriptSessionState>>,
+    reuse_runtime: bool,
 }
 
 impl JavaScriptSession {
@@ -112,6 +239,16 @@ impl JavaScriptSession {
     }
 
     pub fn new(lang: Language, modules: Vec<File>) -> Self {
+        Self::create(lang, modules, false)
+    }
+
+    /// Creates a session for a single run, which takes over the runtime of a previous one-shot
+    /// run (if any) and hands it over to the next one when dropped.
+    pub fn one_shot(lang: Language, modules: Vec<File>) -> Self {
+        Self::create(lang, modules, true)
+    }
+
+    fn create(lang: Language, modules: Vec<File>, reuse_runtime: bool) -> Self {
         let data_root = Path::new("tmp")
             .join("js")
             .join("data")
@@ -121,6 +258,7 @@ impl JavaScriptSession {
             modules,
             data_root,
             state: RefCell::new(None),
+            reuse_runtime,
         }
     }
 
@@ -146,23 +284,53 @@ impl JavaScriptSession {
     }
 
     async fn initialize(&self) -> Result<JavaScriptSessionState, Error> {
-        let rt = AsyncRuntime::new().map_err(js_engine_error)?;
+        let rt = match self.take_idle_runtime() {
+            Some(rt) => {
+                // Cyclic garbage left by the previous run's context is only freed by a GC pass;
+                // it must not count towards this run's memory limit or reported usage
+                rt.run_gc().await;
+                // The previous run's memory limit must not constrain the new context
+                rt.set_memory_limit(usize::MAX).await;
+                rt
+            }
+            None => create_runtime().await?,
+        };
+        // Loaders hand out each module only once, so every new context needs fresh ones
+        self.set_loader(&rt).await?;
         let ctx = AsyncContext::full(&rt).await.map_err(js_engine_error)?;
 
+        async_with!(ctx => |ctx| { init_builtins(ctx) }).await?;
+        rt.idle().await;
+
+        Ok(JavaScriptSessionState {
+            rt,
+            ctx,
+            cwd: "/".to_string(),
+        })
+    }
+
+    fn take_idle_runtime(&self) -> Option<AsyncRuntime> {
+        if !self.reuse_runtime {
+            return None;
+        }
+        IDLE_RUNTIME.with(|idle| idle.borrow_mut().take())
+    }
+
+    async fn set_loader(&self, rt: &AsyncRuntime) -> Result<(), Error> {
         let mut resolver = BuiltinResolver::default();
 
         let mut builtin_loader = BuiltinLoader::default();
 
         for file in &self.modules {
-            let name = file.name.clone();
+            let name = &file.name;
             let contents = get_contents_as_string(file).ok_or_else(|| {
                 Error::CompilationFailed(stage_result_failure(format!(
                     "File {name} has invalid content encoding"
                 )))
             })?;
 
-            resolver = resolver.with_module(&name);
-            builtin_loader = builtin_loader.with_module(&name, contents);
+            resolver = resolver.with_module(name);
+            builtin_loader = builtin_loader.with_module(name, contents.into_owned());
         }
 
         resolver = builtin::add_module_resolvers(resolver);
@@ -170,11 +338,7 @@ impl JavaScriptSession {
 
         rt.set_loader(resolver, loader).await;
 
-        Ok(JavaScriptSessionState {
-            rt,
-            ctx,
-            cwd: "/".to_string(),
-        })
+        Ok(())
     }
 
     #[allow(clippy::await_holding_refcell_ref)]
@@ -182,12 +346,14 @@ impl JavaScriptSession {
         let maybe_state = self.state.borrow();
         let state = maybe_state.as_ref().unwrap();
         let start = Instant::now();
+        let time_limit = options.limits.and_then(|limits| limits.time_ms);
+        let deadline = Deadline::after(time_limit);
 
-        if let Some(limits) = options.limits {
-            if let Some(memory_bytes) = limits.memory_bytes {
-                state.rt.set_memory_limit(memory_bytes as usize).await;
-            }
-        }
+        let memory_limit = options.limits.and_then(|limits| limits.memory_bytes);
+        state
+            .rt
+            .set_memory_limit(memory_limit.map_or(usize::MAX, |bytes| bytes as usize))
+            .await;
 
         let abort_state = async_with!(state.ctx => |ctx| {
            set_globals(
@@ -203,28 +369,41 @@ impl JavaScriptSession {
         .await?;
         state.rt.idle().await;
 
-        let wiring = builtin::wire_builtins();
-
-        let main_name = "main";
-        let main_content = format!("{wiring}\n{snippet}");
+        let prelude = builtin::refresh_builtins();
+        let mut main_content = String::with_capacity(prelude.len() + 1 + snippet.len());
+        main_content.push_str(prelude);
+        main_content.push('\n');
+        main_content.push_str(&snippet);
+
+        // JS code never yields to the timeout future below, so long-running loops in the snippet
+        // or in its scheduled callbacks are stopped by QuickJS itself once the deadline has passed
+        if time_limit.is_some() {
+            state
+                .rt
+                .set_interrupt_handler(Some(Box::new(move || {
+                    deadline.has_passed(monotonic_clock::now())
+                })))
+                .await;
+        }
 
         let future = async {
             async_with!(state.ctx => |ctx| {
-                run_snippet(ctx, main_name.to_string(), main_content, &self.data_root)
+                run_snippet(ctx, main_content, &self.data_root)
             })
             .await?;
+
             state.rt.idle().await;
             async_with!(state.ctx => |ctx| {
-                    builtin::console::get_captured_output(ctx).map(|(stdout, stderr)| (stdout.join("\n"), stderr.join("\n")))
-                })
-                .await
+                builtin::console::get_captured_output(ctx)
+            })
+            .await
         };
-        let result = if let Some(timeout_ms) = options.limits.and_then(|c| c.time_ms) {
+        let result = if let Some(timeout_ms) = time_limit {
             future
                 .timeout(Duration::from_millis(timeout_ms))
                 .map_err(|err| match err.kind() {
                     ErrorKind::TimedOut => Error::Timeout,
-                    _ => Error::RuntimeFailed(stage_result_failure(format!("{err}"))),
+                    _ => Error::RuntimeFailed(stage_result_failure(err.to_string())),
                 })
                 .await
                 .unwrap_or_else(Err)
@@ -232,7 +411,18 @@ impl JavaScriptSession {
             future.await
         };
 
-        for (_, abort_handle) in abort_state.abort_handles.borrow_mut().drain() {
+        if time_limit.is_some() {
+            state.rt.set_interrupt_handler(None).await;
+        }
+
+        // Interrupted code either fails the run or, in a scheduled callback, just stops it early
+        let result = if deadline.has_passed(monotonic_clock::now()) {
+            Err(Error::Timeout)
+        } else {
+            result
+        };
+
+        for abort_handle in abort_state.abort_handles.borrow_mut().drain(..).flatten() {
             abort_handle.abort();
         }
         state.rt.idle().await;
@@ -271,6 +461,12 @@ impl SessionSnapshot<JavaScriptSession> for JavaScriptSession {
 
 impl Drop for JavaScriptSession {
     fn drop(&mut self) {
+        if self.reuse_runtime {
+            if let Some(state) = self.state.get_mut().take() {
+                drop(state.ctx);
+                IDLE_RUNTIME.with(|idle| *idle.borrow_mut() = Some(state.rt));
+            }
+        }
         let _ = std::fs::remove_dir_all(&self.data_root);
     }
 }
@@ -11,6 +11,7 @@ pub mod model;
 use crate::model::{Encoding, Error, ExecResult, File, Language, RunOptions, StageResult};
 use async_trait::async_trait;
 use base64::Engine;
+use std::borrow::Cow;
 
 pub use executor::DurableExecution;
 
@@ -47,24 +48,28 @@ pub trait ExecutionSession: 'static {
     fn as_any_mut(&mut self) -> &mut dyn std::any::Any;
 }
 
-pub(crate) fn get_contents_as_string(file: &File) -> Option<String> {
-    get_contents(file).and_then(|bytes| String::from_utf8(bytes).ok())
+pub(crate) fn get_contents_as_string(file: &File) -> Option<Cow<'_, str>> {
+    match get_contents(file)? {
+        Cow::Borrowed(bytes) => std::str::from_utf8(bytes).ok().map(Cow::Borrowed),
+        Cow::Owned(bytes) => String::from_utf8(bytes).ok().map(Cow::Owned),
+    }
 }
 
-pub(crate) fn get_contents(file: &File) -> Option<Vec<u8>> {
+pub(crate) fn get_contents(file: &File) -> Option<Cow<'_, [u8]>> {
     match file.encoding.unwrap_or(Encoding::Utf8) {
         Encoding::Base64 => base64::prelude::BASE64_STANDARD
-            .decode(file.content.clone())
-            .ok(),
-        Encoding::Hex => hex::decode(&file.content).ok(),
-        Encoding::Utf8 => Some(file.content.clone()),
+            .decode(&file.content)
+            .ok()
+            .map(Cow::Owned),
+        Encoding::Hex => hex::decode(&file.content).ok().map(Cow::Owned),
+        Encoding::Utf8 => Some(Cow::Borrowed(&file.content)),
     }
 }
 
-pub(crate) fn stage_result_failure(message: impl AsRef<str>) -> StageResult {
+pub(crate) fn stage_result_failure(message: impl Into<String>) -> StageResult {
     StageResult {
-        stdout: "".to_string(),
-        stderr: message.as_ref().to_string(),
+        stdout: String::new(),
+        stderr: message.into(),
         exit_code: Some(1),
         signal: None,
     }
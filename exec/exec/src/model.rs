@@ -96,7 +96,7 @@ pub enum Error {
 
 impl core::fmt::Display for Error {
     fn fmt(&self, f: &mut core::fmt::Formatter<'_>) -> core::fmt::Result {
-        write!(f, "{:?}", self)
+        core::fmt::Debug::fmt(self, f)
     }
 }
 
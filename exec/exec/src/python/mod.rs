@@ -4,14 +4,14 @@ use crate::model::{Error, ExecResult, File, Language, RunOptions};
 use crate::model::{LanguageKind, StageResult};
 use crate::{get_contents_as_string, io_error, stage_result_failure};
 use indoc::indoc;
-use rustpython::vm::builtins::{PyBaseException, PyBaseExceptionRef, PyStr, PyStrRef};
+use rustpython::vm::builtins::{PyBaseExceptionRef, PyStr, PyStrRef};
 use rustpython::vm::{
     extend_class, py_class, Interpreter, PyObjectRef, PyRef, PyResult, Settings, VirtualMachine,
 };
 use rustpython::{vm, InterpreterBuilderExt};
+use std::cell::RefCell;
 use std::path::{Path, PathBuf};
 use std::sync::atomic::AtomicU32;
-use std::sync::Mutex;
 use std::{fs, io};
 use wstd::time::Instant;
 
@@ -21,7 +21,7 @@ fn py_exception_error(vm: &VirtualMachine, err: &PyBaseExceptionRef) -> Error {
     let mut output = String::new();
     match vm.write_exception(&mut output, err) {
         Ok(_) => Error::RuntimeFailed(StageResult {
-            stdout: "".to_string(),
+            stdout: String::new(),
             stderr: output,
             exit_code: Some(1),
             signal: None,
@@ -44,6 +44,99 @@ impl PythonComponent {
     }
 }
 
+// Prepares stdio, argv, environment and the restricted file system before each snippet
+const INIT_SCRIPT: &str = indoc!(
+    r#"import io
+    import os
+    import sys
+    import builtins
+
+    __stdout = io.StringIO('')
+    __stderr = io.StringIO('')
+    __stdin = io.StringIO(__external_stdin)
+    sys.stdout = __stdout
+    sys.stderr = __stderr
+    sys.stdin = __stdin
+
+    sys.argv = __argv
+    os.environ = dict(__env)
+
+    class RestrictedFileSystem:
+        def __init__(self, base_directory):
+            self.base_directory = os.path.abspath(base_directory)
+            self._open = builtins.open
+            self._listdir = os.listdir
+            self._mkdir = os.mkdir
+            self._makedirs = os.makedirs
+            self._remove = os.remove
+            self._rmdir = os.rmdir
+            self._rename = os.rename
+
+        def open(self, path, *args, **kwargs):
+            path = self._to_abs_path(path)
+            return self._open(path, *args, **kwargs)
+
+        def getcwd(self):
+            return self._cwd
+
+        def listdir(self, path='.'):
+            path = self._to_abs_path(path)
+            return self._listdir(path)
+
+        def mkdir(self, path):
+            path = self._to_abs_path(path)
+            self._mkdir(path)
+
+        def makedirs(self, path):
+            path = self._to_abs_path(path)
+            self._makedirs(path)
+
+        def remove(self, path):
+            path = self._to_abs_path(path)
+            self._remove(path)
+
+        def rmdir(self, path):
+            path = self._to_abs_path(path)
+            self._rmdir(path)
+
+        def rename(self, src, dst):
+            src = self._to_abs_path(src)
+            dst = self._to_abs_path(dst)
+            self._rename(src, dst)
+
+        def set_cwd(self, path):
+            self._cwd = path
+
+        def _to_abs_path(self, path):
+            cwd = self._get_abs_cwd()
+            return os.path.join(cwd, path)
+
+        def _get_abs_cwd(self):
+            if self._cwd.startswith('/'):
+                path = os.path.join(self.base_directory, self._cwd[1:])
+            else:
+                path = os.path.join(self.base_directory, self._cwd)
+            if os.path.commonprefix([self.base_directory, path]) != self.base_directory:
+                raise OSError("Access denied: path is outside the data root")
+            return path
+    if not globals().get('__fs_patched', False):
+        __restricted_fs = RestrictedFileSystem(__data_root)
+
+        builtins.open = __restricted_fs.open
+        os.getcwd = __restricted_fs.getcwd
+        os.listdir = __restricted_fs.listdir
+        os.mkdir = __restricted_fs.mkdir
+        os.makedirs = __restricted_fs.makedirs
+        os.remove = __restricted_fs.remove
+        os.rmdir = __restricted_fs.rmdir
+        os.rename = __restricted_fs.rename
+
+        __fs_patched = True
+
+    __restricted_fs.set_cwd(__cwd)
+    "#
+);
+
 fn ensure_language_is_supported(lang: &Language) -> Result<(), Error> {
     if lang.kind != LanguageKind::Python {
         Err(Error::UnsupportedLanguage)
@@ -89,7 +182,7 @@ pub struct PythonSession {
     modules: Vec<File>,
     data_root: PathBuf,
     module_root: PathBuf,
-    state: Mutex<Option<PythonSessionState>>,
+    state: RefCell<Option<PythonSessionState>>,
 }
 
 impl PythonSession {
@@ -98,7 +191,7 @@ impl PythonSession {
     }
 
     pub fn set_cwd(&self, path: String) -> Result<(), Error> {
-        if let Some(state) = self.state.lock().unwrap().as_mut() {
+        if let Some(state) = self.state.borrow_mut().as_mut() {
             state.cwd = path;
         }
         Ok(())
@@ -119,7 +212,7 @@ impl PythonSession {
             modules,
             data_root,
             module_root,
-            state: Mutex::new(None),
+            state: RefCell::new(None),
         }
     }
 
@@ -129,203 +222,99 @@ impl PythonSession {
 
         let start = Instant::now();
 
-        let maybe_state = self.state.lock().unwrap();
+        let maybe_state = self.state.borrow();
         let state = maybe_state.as_ref().unwrap();
-        let mut result = None;
-
-        let _vm_res: Result<(), PyRef<PyBaseException>> = state.interpreter.enter(|vm| {
-            let code_obj = vm
-                .compile(&snippet, vm::compiler::Mode::Exec, "<snippet>".to_string())
-                .map_err(|err| vm.new_syntax_error(&err, Some(&snippet)))?;
-
-            let scope = vm.new_scope_with_builtins();
-            scope.globals.set_item(
-                "__external_stdin",
-                vm.new_pyobj(options.stdin.unwrap_or_default()),
-                vm,
-            )?;
-
-            let env_pairs = options
-                .env
-                .unwrap_or_default()
-                .iter()
-                .map(|(k, v)| vm.new_pyobj((k, v)))
-                .collect::<Vec<_>>();
-            scope
-                .globals
-                .set_item("__env", vm.new_pyobj(env_pairs), vm)?;
-
-            scope.globals.set_item(
-                "__argv",
-                vm.new_pyobj(
-                    options
-                        .args
-                        .unwrap_or_default()
-                        .iter()
-                        .map(|s| vm.new_pyobj(s))
-                        .collect::<Vec<_>>(),
-                ),
-                vm,
-            )?;
-
-            scope.globals.set_item(
-                "__module_root",
-                vm.new_pyobj(self.module_root.to_string_lossy().to_string()),
-                vm,
-            )?;
-
-            scope.globals.set_item(
-                "__data_root",
-                vm.new_pyobj(self.data_root.to_string_lossy().to_string()),
-                vm,
-            )?;
-
-            scope
-                .globals
-                .set_item("__cwd", vm.new_pyobj(state.cwd.clone()), vm)?;
-
-            let init_script = indoc!(
-                r#"import io
-                import os
-                import sys
-                import builtins
-
-                __stdout = io.StringIO('')
-                __stderr = io.StringIO('')
-                __stdin = io.StringIO(__external_stdin)
-                sys.stdout = __stdout
-                sys.stderr = __stderr
-                sys.stdin = __stdin
-
-                sys.argv = __argv
-                os.environ = dict(__env)
-
-                class RestrictedFileSystem:
-                    def __init__(self, base_directory):
-                        self.base_directory = os.path.abspath(base_directory)
-                        self._open = builtins.open
-                        self._listdir = os.listdir
-                        self._mkdir = os.mkdir
-                        self._makedirs = os.makedirs
-                        self._remove = os.remove
-                        self._rmdir = os.rmdir
-                        self._rename = os.rename
-
-                    def open(self, path, *args, **kwargs):
-                        path = self._to_abs_path(path)
-                        return self._open(path, *args, **kwargs)
-
-                    def getcwd(self):
-                        return self._cwd
-
-                    def listdir(self, path='.'):
-                        path = self._to_abs_path(path)
-                        return self._listdir(path)
-
-                    def mkdir(self, path):
-                        path = self._to_abs_path(path)
-                        self._mkdir(path)
-
-                    def makedirs(self, path):
-                        path = self._to_abs_path(path)
-                        self._makedirs(path)
-
-                    def remove(self, path):
-                        path = self._to_abs_path(path)
-                        self._remove(path)
-
-                    def rmdir(self, path):
-                        path = self._to_abs_path(path)
-                        self._rmdir(path)
-
-                    def rename(self, src, dst):
-                        src = self._to_abs_path(src)
-                        dst = self._to_abs_path(dst)
-                        self._rename(src, dst)
-
-                    def set_cwd(self, path):
-                        self._cwd = path
-
-                    def _to_abs_path(self, path):
-                        cwd = self._get_abs_cwd()
-                        return os.path.join(cwd, path)
-
-                    def _get_abs_cwd(self):
-                        if self._cwd.startswith('/'):
-                            path = os.path.join(self.base_directory, self._cwd[1:])
-                        else:
-                            path = os.path.join(self.base_directory, self._cwd)
-                        if os.path.commonprefix([self.base_directory, path]) != self.base_directory:
-                            raise OSError("Access denied: path is outside the data root")
-                        return path
-                if not globals().get('__fs_patched', False):
-                    __restricted_fs = RestrictedFileSystem(__data_root)
-
-                    builtins.open = __restricted_fs.open
-                    os.getcwd = __restricted_fs.getcwd
-                    os.listdir = __restricted_fs.listdir
-                    os.mkdir = __restricted_fs.mkdir
-                    os.makedirs = __restricted_fs.makedirs
-                    os.remove = __restricted_fs.remove
-                    os.rmdir = __restricted_fs.rmdir
-                    os.rename = __restricted_fs.rename
-
-                    __fs_patched = True
-
-                __restricted_fs.set_cwd(__cwd)
-                "#
-            );
-            match vm.run_string(scope.clone(), init_script, "<init>".to_string()) {
-                Ok(_) => {}
-                Err(err) => {
-                    let err = py_exception_error(vm, &err);
-                    result = Some(Err(err.clone()));
-                    return Ok(());
-                }
-            }
-
-            match vm.run_code_obj(code_obj, scope.clone()) {
-                Ok(_) => {
-                    let stdout = vm.sys_module.get_attr("stdout", vm)?;
-                    let stderr = vm.sys_module.get_attr("stderr", vm)?;
-
-                    let stdout_getvalue = stdout.get_attr("getvalue", vm)?;
-                    let stderr_getvalue = stderr.get_attr("getvalue", vm)?;
-
-                    let stdout =
-                        unsafe { stdout_getvalue.call((), vm)?.downcast_unchecked::<PyStr>() };
-                    let stderr =
-                        unsafe { stderr_getvalue.call((), vm)?.downcast_unchecked::<PyStr>() };
-
-                    let stdout = stdout.as_str();
-                    let stderr = stderr.as_str();
-
-                    result = Some(Ok(ExecResult {
-                        compile: None,
-                        run: StageResult {
-                            stdout: stdout.to_string(),
-                            stderr: stderr.to_string(),
-                            exit_code: Some(0),
-                            signal: None,
-                        },
-                        time_ms: Some(start.elapsed().as_millis() as u64),
-                        memory_bytes: None,
-                    }));
-                }
-                Err(err) => {
-                    let err = py_exception_error(vm, &err);
-                    result = Some(Err(err));
-                }
-            }
 
-            Ok(())
-        });
+        let (stdout, stderr) = state.interpreter.enter(|vm| {
+            self.run_in_vm(vm, &state.cwd, &snippet, options)
+                .map_err(|err| py_exception_error(vm, &err))
+        })?;
+
+        Ok(ExecResult {
+            compile: None,
+            run: StageResult {
+                stdout,
+                stderr,
+                exit_code: Some(0),
+                signal: None,
+            },
+            time_ms: Some(start.elapsed().as_millis() as u64),
+            memory_bytes: None,
+        })
+    }
 
-        result.unwrap()
+    fn run_in_vm(
+        &self,
+        vm: &VirtualMachine,
+        cwd: &str,
+        snippet: &str,
+        options: RunOptions,
+    ) -> PyResult<(String, String)> {
+        let code_obj = vm
+            .compile(snippet, vm::compiler::Mode::Exec, "<snippet>".to_string())
+            .map_err(|err| vm.new_syntax_error(&err, Some(snippet)))?;
+
+        let scope = vm.new_scope_with_builtins();
+        scope.globals.set_item(
+            "__external_stdin",
+            vm.new_pyobj(options.stdin.unwrap_or_default()),
+            vm,
+        )?;
+
+        let env_pairs = options
+            .env
+            .unwrap_or_default()
+            .iter()
+            .map(|(k, v)| vm.new_pyobj((k, v)))
+            .collect::<Vec<_>>();
+        scope
+            .globals
+            .set_item("__env", vm.new_pyobj(env_pairs), vm)?;
+
+        scope.globals.set_item(
+            "__argv",
+            vm.new_pyobj(
+                options
+                    .args
+                    .unwrap_or_default()
+                    .iter()
+                    .map(|s| vm.new_pyobj(s))
+                    .collect::<Vec<_>>(),
+            ),
+            vm,
+        )?;
+
+        scope.globals.set_item(
+            "__module_root",
+            vm.new_pyobj(self.module_root.to_string_lossy().into_owned()),
+            vm,
+        )?;
+
+        scope.globals.set_item(
+            "__data_root",
+            vm.new_pyobj(self.data_root.to_string_lossy().into_owned()),
+            vm,
+        )?;
+
+        scope.globals.set_item("__cwd", vm.new_pyobj(cwd), vm)?;
+
+        vm.run_string(scope.clone(), INIT_SCRIPT, "<init>".to_string())?;
+        vm.run_code_obj(code_obj, scope)?;
+
+        let stdout = vm.sys_module.get_attr("stdout", vm)?;
+        let stderr = vm.sys_module.get_attr("stderr", vm)?;
+
+        let stdout_getvalue = stdout.get_attr("getvalue", vm)?;
+        let stderr_getvalue = stderr.get_attr("getvalue", vm)?;
+
+        let stdout = unsafe { stdout_getvalue.call((), vm)?.downcast_unchecked::<PyStr>() };
+        let stderr = unsafe { stderr_getvalue.call((), vm)?.downcast_unchecked::<PyStr>() };
+
+        Ok((stdout.as_str().to_string(), stderr.as_str().to_string()))
     }
 
     fn ensure_initialized(&self) -> Result<(), Error> {
-        let mut state_field = self.state.lock().unwrap();
+        let mut state_field = self.state.borrow_mut();
         let state = state_field.take();
         match state {
             None => {
@@ -343,7 +332,7 @@ impl PythonSession {
         std::fs::create_dir_all(&self.module_root).map_err(io_error)?;
 
         let mut settings =
-            Settings::default().with_path(self.module_root.to_string_lossy().to_string());
+            Settings::default().with_path(self.module_root.to_string_lossy().into_owned());
         settings.ignore_environment = true;
 
         let interpreter = Interpreter::builder(settings).init_stdlib().build();
@@ -357,7 +346,7 @@ impl PythonSession {
                 }
             }
             if let Some(content) = get_contents_as_string(file) {
-                if let Err(err) = std::fs::write(&path, content) {
+                if let Err(err) = std::fs::write(&path, content.as_bytes()) {
                     return Err(io_error(err));
                 }
             } else {
@@ -393,7 +382,7 @@ impl SessionSnapshot<PythonSession> for PythonSession {
 
 impl Drop for PythonSession {
     fn drop(&mut self) {
-        if let Some(mut state) = self.state.lock().unwrap().take() {
+        if let Some(mut state) = self.state.get_mut().take() {
             state.interpreter.finalize(state.last_error.take());
         }
 
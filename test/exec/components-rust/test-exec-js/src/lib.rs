@@ -69,6 +69,14 @@ pub trait ExecJsTest {
     async fn test09(&self) -> bool;
     async fn test10(&self) -> bool;
     async fn test11(&self) -> bool;
+    async fn test12(&self) -> bool;
+    async fn test13(&self) -> bool;
+    async fn test14(&self) -> bool;
+    async fn test15(&self) -> bool;
+    async fn test16(&self) -> bool;
+    async fn test17(&self) -> bool;
+    async fn test18(&self) -> bool;
+    async fn test19(&self) -> bool;
 }
 
 struct ExecJsTestImpl {
@@ -792,6 +800,322 @@ impl ExecJsTest for ExecJsTestImpl {
 
         r1 && r2 && r3
     }
+    async fn test12(&self) -> bool {
+        match Provider::run(
+            Language {
+                kind: LanguageKind::Javascript,
+                version: None,
+            },
+            vec![],
+            indoc! { r#"
+                while (true) {}
+            "# }
+            .to_string(),
+            time_limited_run_options(1000),
+        ).await {
+            Ok(result) => {
+                println!("Result: {:?}", result);
+                false
+            }
+            Err(err) => {
+                println!("Error: {}", err);
+                matches!(err, Error::Timeout)
+            }
+        }
+    }
+
+    async fn test13(&self) -> bool {
+        match Provider::run(
+            Language {
+                kind: LanguageKind::Javascript,
+                version: None,
+            },
+            vec![],
+            indoc! { r#"
+                let x = 0;
+                setInterval(() => {
+                    for (let i = 0; i < 5e6; i++) {
+                        x += i;
+                    }
+                }, 10);
+            "# }
+            .to_string(),
+            time_limited_run_options(1000),
+        ).await {
+            Ok(result) => {
+                println!("Result: {:?}", result);
+                false
+            }
+            Err(err) => {
+                println!("Error: {}", err);
+                matches!(err, Error::Timeout)
+            }
+        }
+    }
+    async fn test14(&self) -> bool {
+        const SNIPPET: &str = indoc! { r#"
+            import { argv, env, stdin } from "node:process";
+            import { x } from "test/module.js";
+            console.log(argv.join(","), env.INPUT, stdin.readLine(), typeof globalThis.leaked, x);
+            globalThis.leaked = argv[0];
+        "# };
+
+        let mut results = Vec::new();
+        // The third run loads the snippet's bytecode cached by the second one
+        for (arg, input, stdin) in [
+            ("first", "one", "in1\n"),
+            ("second", "two", "in2\n"),
+            ("third", "three", "in3\n"),
+        ] {
+            let result = Provider::run(
+                Language {
+                    kind: LanguageKind::Javascript,
+                    version: None,
+                },
+                vec![js_module("export const x = 42;")],
+                SNIPPET.to_string(),
+                RunOptions {
+                    stdin: Some(stdin.to_string()),
+                    args: Some(vec![arg.to_string()]),
+                    env: Some(vec![("INPUT".to_string(), input.to_string())]),
+                    limits: None,
+                },
+            )
+            .await
+            .map_or_else(
+                |err| {
+                    println!("Error: {}", err);
+                    false
+                },
+                |result| {
+                    println!("Result: {:?}", result);
+                    let expected = format!("{arg} {input} {} undefined 42", stdin.trim_end());
+                    result.run.stdout == expected && result.run.exit_code == Some(0)
+                },
+            );
+            results.push(result);
+        }
+
+        results.iter().all(|r| *r)
+    }
+
+    async fn test15(&self) -> bool {
+        let mut results = Vec::new();
+        for x in ["1", "2"] {
+            let result = Provider::run(
+                Language {
+                    kind: LanguageKind::Javascript,
+                    version: None,
+                },
+                vec![js_module(&format!("export const x = {x};"))],
+                indoc! { r#"
+                    import { x } from "test/module.js";
+                    console.log(x);
+                "# }
+                .to_string(),
+                empty_run_options(),
+            )
+            .await
+            .map_or_else(
+                |err| {
+                    println!("Error: {}", err);
+                    false
+                },
+                |result| {
+                    println!("Result: {:?}", result);
+                    result.run.stdout == x && result.run.exit_code == Some(0)
+                },
+            );
+            results.push(result);
+        }
+
+        results.iter().all(|r| *r)
+    }
+    async fn test16(&self) -> bool {
+        const SNIPPET: &str = indoc! { r#"
+            const buffer = new Uint8Array(16 * 1024 * 1024);
+            console.log(buffer.length);
+        "# };
+
+        let session = Session::new(
+            Language {
+                kind: LanguageKind::Javascript,
+                version: None,
+            },
+            vec![],
+        );
+
+        let r1 = session
+            .run(
+                SNIPPET.to_string(),
+                RunOptions {
+                    limits: Some(Limits {
+                        time_ms: None,
+                        memory_bytes: Some(4 * 1024 * 1024),
+                        file_size_bytes: None,
+                        max_processes: None,
+                    }),
+                    ..empty_run_options()
+                },
+            )
+            .await
+            .map_or_else(
+                |err| {
+                    println!("Error running script: {}", err);
+                    true
+                },
+                |result| {
+                    println!("Result: {:?}", result);
+                    false
+                },
+            );
+
+        let r2 = session
+            .run(SNIPPET.to_string(), empty_run_options())
+            .await
+            .map_or_else(
+                |err| {
+                    println!("Error running script: {}", err);
+                    false
+                },
+                |result| {
+                    println!("Result: {:?}", result);
+                    result.run.stdout == "16777216" && result.run.exit_code == Some(0)
+                },
+            );
+
+        r1 && r2
+    }
+
+    async fn test17(&self) -> bool {
+        match Provider::run(
+            Language {
+                kind: LanguageKind::Javascript,
+                version: None,
+            },
+            vec![],
+            indoc! { r#"
+                function depth(n) {
+                    return n === 0 ? 0 : 1 + depth(n - 1);
+                }
+                console.log(depth(1000000));
+            "# }
+            .to_string(),
+            empty_run_options(),
+        ).await {
+            Ok(result) => {
+                println!("Result: {:?}", result);
+                false
+            }
+            Err(err) => {
+                println!("Error: {}", err);
+                matches!(&err, Error::RuntimeFailed(result) if result.stderr.contains("RangeError"))
+            }
+        }
+    }
+
+    async fn test18(&self) -> bool {
+        let session = Session::new(
+            Language {
+                kind: LanguageKind::Javascript,
+                version: None,
+            },
+            vec![],
+        );
+
+        let r1 = session
+            .run(
+                indoc! { r#"
+                    globalThis.setTimeout = undefined;
+                    globalThis.console = undefined;
+                    delete globalThis.process;
+                "# }
+                .to_string(),
+                empty_run_options(),
+            )
+            .await
+            .map_or_else(
+                |err| {
+                    println!("Error running script: {}", err);
+                    false
+                },
+                |result| {
+                    println!("Result: {:?}", result);
+                    true
+                },
+            );
+
+        let r2 = session
+            .run(
+                indoc! { r#"
+                    setTimeout(() => console.log("ok", typeof process.env), 0);
+                "# }
+                .to_string(),
+                empty_run_options(),
+            )
+            .await
+            .map_or_else(
+                |err| {
+                    println!("Error running script: {}", err);
+                    false
+                },
+                |result| {
+                    println!("Result: {:?}", result);
+                    result.run.stdout == "ok object" && result.run.exit_code == Some(0)
+                },
+            );
+
+        r1 && r2
+    }
+
+    async fn test19(&self) -> bool {
+        let r1 = match Provider::run(
+            Language {
+                kind: LanguageKind::Javascript,
+                version: None,
+            },
+            vec![],
+            indoc! { r#"
+                setTimeout(() => { for (;;) {} }, 0);
+            "# }
+            .to_string(),
+            time_limited_run_options(1000),
+        ).await {
+            Ok(result) => {
+                println!("Result: {:?}", result);
+                false
+            }
+            Err(err) => {
+                println!("Error: {}", err);
+                matches!(err, Error::Timeout)
+            }
+        };
+
+        // The next run must not be interrupted by the previous run's deadline
+        let r2 = match Provider::run(
+            Language {
+                kind: LanguageKind::Javascript,
+                version: None,
+            },
+            vec![],
+            indoc! { r#"
+                setTimeout(() => console.log("done"), 0);
+            "# }
+            .to_string(),
+            empty_run_options(),
+        ).await {
+            Ok(result) => {
+                println!("Result: {:?}", result);
+                result.run.stdout == "done" && result.run.exit_code == Some(0)
+            }
+            Err(err) => {
+                println!("Error: {}", err);
+                false
+            }
+        };
+
+        r1 && r2
+    }
 }
 
 fn empty_run_options() -> RunOptions {
@@ -802,3 +1126,23 @@ fn empty_run_options() -> RunOptions {
         limits: None,
     }
 }
+
+fn time_limited_run_options(time_ms: u64) -> RunOptions {
+    RunOptions {
+        limits: Some(Limits {
+            time_ms: Some(time_ms),
+            memory_bytes: None,
+            file_size_bytes: None,
+            max_processes: None,
+        }),
+        ..empty_run_options()
+    }
+}
+
+fn js_module(content: &str) -> File {
+    File {
+        name: "test/module.js".to_string(),
+        content: content.as_bytes().to_vec(),
+        encoding: Some(Encoding::Utf8),
+    }
+}
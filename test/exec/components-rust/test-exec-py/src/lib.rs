@@ -16,6 +16,7 @@ pub trait ExecPyTest {
     async fn test5(&self) -> bool;
     async fn test6(&self) -> bool;
     async fn test7(&self) -> bool;
+    async fn test8(&self) -> bool;
 }
 
 struct ExecPyTestImpl {
@@ -453,6 +454,32 @@ impl ExecPyTest for ExecPyTestImpl {
 
         r1 && r2 && r3 && r4 && r5 && r6
     }
+    async fn test8(&self) -> bool {
+        match Provider::run(
+            Language {
+                kind: LanguageKind::Python,
+                version: None,
+            },
+            vec![],
+            indoc! { r#"
+                def broken(:
+                    print('unreachable')
+            "# }
+            .to_string(),
+            empty_run_options(),
+        )
+        .await
+        {
+            Ok(result) => {
+                println!("Result: {:?}", result);
+                false
+            }
+            Err(err) => {
+                println!("Error: {}", err);
+                matches!(err, Error::RuntimeFailed(_))
+            }
+        }
+    }
 }
 
 fn empty_run_options() -> RunOptions {